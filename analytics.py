@@ -1,6 +1,9 @@
 import pandas as pd
 import numpy as np
 import sqlalchemy
+from sqlalchemy import bindparam, text
+
+from init_db import migrate_db
 
 DATABASE_URL = "sqlite:///market.db"
 
@@ -186,3 +189,224 @@ def forecast_price(ticker, days=30):
     
     return forecast[['ds', 'yhat', 'yhat_lower', 'yhat_upper']]
 
+
+
+# --- Price Adjustment ---
+def cumulative_factor_after(factors):
+    """Product of the per-row factors strictly after each row (rows sorted by date)."""
+    return factors[::-1].cumprod()[::-1].shift(-1, fill_value=1.0)
+
+
+def adjust_prices(df_prices, df_actions):
+    """
+    Derive the dividend/split adjusted close_price and split adjusted volume
+    from as-traded raw_close_price/raw_volume and the corporate actions
+    (date, ticker, dividend, split_ratio), the way Yahoo Finance adjusts.
+    """
+    df = df_prices.merge(
+        df_actions[['date', 'ticker', 'dividend', 'split_ratio']],
+        on=['date', 'ticker'], how='left')
+    df['dividend'] = df['dividend'].astype(float).fillna(0.0)
+    df['split_ratio'] = df['split_ratio'].astype(float).fillna(1.0)
+
+    frames = []
+    for ticker, df_ticker in df.sort_values('date').groupby('ticker'):
+        df_ticker = df_ticker.copy()
+        splits_after = cumulative_factor_after(df_ticker['split_ratio'])
+        # A dividend D lowers all earlier closes by (1 - D / previous close)
+        dividend_factor = 1 - df_ticker['dividend'] / df_ticker['raw_close_price'].shift(1)
+        dividends_after = cumulative_factor_after(dividend_factor.fillna(1.0))
+
+        df_ticker['close_price'] = df_ticker['raw_close_price'] / splits_after * dividends_after
+        df_ticker['volume'] = (df_ticker['raw_volume'] * splits_after).round().astype('Int64')
+        frames.append(df_ticker)
+
+    return pd.concat(frames).drop(columns=['dividend', 'split_ratio'])
+
+
+# --- Sector / Group Indices ---
+GROUP_WEIGHTINGS = ['equal', 'cap']
+INDEX_BASE = 100.0
+# Calendar days of prices re-read before the last index date so every
+# ticker has a previous close across weekends and holidays.
+INDEX_OVERLAP_DAYS = 10
+
+
+def calculate_group_returns(df_prices, weighting='equal', shares=None):
+    """
+    Calculate daily group returns from per-ticker returns.
+    df_prices: long DataFrame with date, ticker, close_price.
+    'equal' averages the member returns of each day, 'cap' weights them by the
+    previous day's market cap (close * shares outstanding). Tickers without
+    shares outstanding are left out of the cap-weighted index.
+    """
+    df = df_prices.sort_values(['ticker', 'date']).copy()
+    df['return'] = df.groupby('ticker')['close_price'].pct_change()
+    df['prev_close'] = df.groupby('ticker')['close_price'].shift(1)
+
+    returns = df.pivot(index='date', columns='ticker', values='return')
+
+    if weighting == 'equal':
+        group_returns = returns.mean(axis=1)
+    else:
+        shares = pd.Series(shares or {}, dtype=float).dropna()
+        prev_close = df.pivot(index='date', columns='ticker', values='prev_close')
+        caps = prev_close.mul(shares.reindex(prev_close.columns), axis=1)
+        caps = caps.where(returns.notna())
+        group_returns = (returns * caps).sum(axis=1, min_count=1) / caps.sum(axis=1)
+
+    return group_returns.dropna()
+
+
+def get_groups(engine):
+    """
+    Return {group_name: [tickers]} for all sectors and user-defined groups.
+    Sectors take precedence over a user-defined group of the same name.
+    """
+    df_sectors = pd.read_sql(
+        "SELECT sector AS group_name, ticker FROM dim_stock WHERE sector IS NOT NULL",
+        engine)
+    df_custom = pd.read_sql("SELECT group_name, ticker FROM dim_group_member", engine)
+
+    groups = {}
+    for df in (df_custom, df_sectors):
+        for group_name, df_group in df.groupby('group_name'):
+            groups[group_name] = sorted(df_group['ticker'])
+    return groups
+
+
+def update_group_index(engine, group_name, tickers, rebuild=False):
+    """
+    Extend the equal- and cap-weighted index series of a group in
+    fact_group_index with the dates added since its last stored level.
+    With rebuild=True the existing series are dropped and recomputed.
+    """
+    with engine.begin() as conn:
+        if rebuild:
+            conn.execute(
+                text("DELETE FROM fact_group_index WHERE group_name = :g"),
+                {'g': group_name})
+
+        df_shares = pd.read_sql(
+            text("SELECT ticker, shares_outstanding FROM dim_stock "
+                 "WHERE ticker IN :tickers").bindparams(
+                bindparam('tickers', expanding=True)),
+            conn, params={'tickers': tickers})
+        shares = df_shares.set_index('ticker')['shares_outstanding'].dropna().to_dict()
+
+        # A cap-weighted series needs at least one member with shares outstanding
+        weightings = [w for w in GROUP_WEIGHTINGS if w != 'cap' or shares]
+
+        last = {}
+        for weighting in weightings:
+            last[weighting] = conn.execute(text("""
+                SELECT date, index_value FROM fact_group_index
+                WHERE group_name = :g AND weighting = :w
+                ORDER BY date DESC LIMIT 1
+            """), {'g': group_name, 'w': weighting}).fetchone()
+
+    # Only re-read the tail of the fact table needed to extend the series
+    start_date = '0000-00-00'
+    if all(last.values()):
+        earliest = min(pd.to_datetime(row[0]) for row in last.values())
+        start_date = (earliest - pd.Timedelta(days=INDEX_OVERLAP_DAYS)).strftime('%Y-%m-%d')
+
+    query = text("""
+        SELECT date, ticker, close_price
+        FROM fact_price_daily
+        WHERE ticker IN :tickers AND date >= :start
+    """).bindparams(bindparam('tickers', expanding=True))
+    df_prices = pd.read_sql(query, engine, params={'tickers': tickers, 'start': start_date})
+    if df_prices.empty:
+        return
+
+    rows = []
+    for weighting in weightings:
+        group_returns = calculate_group_returns(df_prices, weighting, shares)
+        if last[weighting] is not None:
+            last_date, level = last[weighting]
+            group_returns = group_returns[group_returns.index > last_date]
+        else:
+            # New series: store the base level on the first price date so the
+            # first day's return is part of every window
+            level = INDEX_BASE
+            base_date = df_prices['date'].min()
+            group_returns = group_returns[group_returns.index > base_date]
+            rows.append(pd.DataFrame({
+                'group_name': [group_name],
+                'weighting': [weighting],
+                'date': [base_date],
+                'daily_return': [None],
+                'index_value': [INDEX_BASE],
+            }))
+        if group_returns.empty:
+            continue
+
+        levels = level * (1 + group_returns).cumprod()
+        rows.append(pd.DataFrame({
+            'group_name': group_name,
+            'weighting': weighting,
+            'date': group_returns.index,
+            'daily_return': group_returns.values,
+            'index_value': levels.values,
+        }))
+
+    if rows:
+        pd.concat(rows).to_sql('fact_group_index', engine, if_exists='append', index=False)
+
+
+def update_group_indices(engine, rebuild=False):
+    """Bring the index series of every sector and user-defined group up to date."""
+    for group_name, tickers in get_groups(engine).items():
+        update_group_index(engine, group_name, tickers, rebuild=rebuild)
+
+
+def save_custom_group(group_name, tickers):
+    """
+    Create or replace a user-defined group and build its index series.
+    Raises ValueError if the name is already used by a sector.
+    """
+    engine = sqlalchemy.create_engine(DATABASE_URL)
+    # Databases the ETL has not upgraded yet lack the group tables
+    migrate_db(engine)
+    with engine.begin() as conn:
+        is_sector = conn.execute(
+            text("SELECT 1 FROM dim_stock WHERE sector = :g LIMIT 1"),
+            {'g': group_name}).fetchone()
+        if is_sector:
+            raise ValueError(f"'{group_name}' is a sector name, choose another group name.")
+
+        conn.execute(
+            text("DELETE FROM dim_group_member WHERE group_name = :g"),
+            {'g': group_name})
+        conn.execute(
+            text("INSERT INTO dim_group_member (group_name, ticker) VALUES (:g, :t)"),
+            [{'g': group_name, 't': t} for t in tickers])
+    update_group_index(engine, group_name, tickers, rebuild=True)
+
+
+def calculate_group_performance(days=30, weighting='equal'):
+    """
+    Total return of every group over the last `days` calendar days, read from
+    two stored index levels per group instead of the raw price table.
+    Windows starting before a series begins use its base level.
+    """
+    engine = sqlalchemy.create_engine(DATABASE_URL)
+    query = text("""
+        SELECT l.group_name, l.end_value,
+            COALESCE(
+                (SELECT s.index_value FROM fact_group_index s
+                 WHERE s.group_name = l.group_name AND s.weighting = :w
+                   AND s.date <= date(l.end_date, :offset)
+                 ORDER BY s.date DESC LIMIT 1),
+                :base) AS start_value
+        FROM (
+            SELECT group_name, MAX(date) AS end_date, index_value AS end_value
+            FROM fact_group_index
+            WHERE weighting = :w
+            GROUP BY group_name
+        ) l
+    """)
+    df = pd.read_sql(query, engine, params={'w': weighting, 'offset': f'-{int(days)} days', 'base': INDEX_BASE})
+    df['return'] = df['end_value'] / df['start_value'] - 1
+    return df.dropna(subset=['return'])[['group_name', 'return']]
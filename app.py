@@ -3,7 +3,7 @@ import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 import sqlalchemy
-from analytics import calculate_var, calculate_beta, calculate_rsi, calculate_sma, calculate_portfolio_risk, forecast_price
+from analytics import calculate_var, calculate_beta, calculate_rsi, calculate_sma, calculate_portfolio_risk, forecast_price, calculate_group_performance, save_custom_group
 import datetime
 
 # Configuration
@@ -46,23 +46,8 @@ def get_market_data_for_scatter(ticker):
     return df_merged
 
 @st.cache_data
-def get_sector_performance():
-    engine = sqlalchemy.create_engine(DATABASE_URL)
-    query = """
-        SELECT s.sector, p.date, p.close_price
-        FROM fact_price_daily p
-        JOIN dim_stock s ON p.ticker = s.ticker
-        WHERE p.date >= date('now', '-30 days')
-    """
-    df = pd.read_sql(query, engine)
-    df['date'] = pd.to_datetime(df['date'])
-    
-    # Calculate returns
-    df['return'] = df.groupby('sector')['close_price'].pct_change()
-    
-    # Average daily return by sector
-    sector_perf = df.groupby('sector')['return'].mean().reset_index()
-    return sector_perf
+def get_sector_performance(days, weighting):
+    return calculate_group_performance(days, weighting)
 
 # Sidebar
 st.sidebar.title("Alpha-Seeker")
@@ -150,15 +135,33 @@ with tab1:
 
     # Sector Heatmap
     st.markdown("---")
-    st.subheader("Sector Performance (Last 30 Days)")
+    st.subheader("Sector & Group Performance")
+    col_lb, col_w = st.columns(2)
+    lookback_days = col_lb.number_input("Lookback (Days)", min_value=1, max_value=5 * 365, value=30)
+    weighting = col_w.radio("Weighting", ["equal", "cap"], format_func=lambda w: f"{w.capitalize()}-weighted", horizontal=True)
     try:
-        df_sector = get_sector_performance()
+        df_sector = get_sector_performance(lookback_days, weighting)
         if not df_sector.empty:
-            fig_sector = px.bar(df_sector, x='sector', y='return', color='return', color_continuous_scale='RdYlGn', title="Avg Daily Return by Sector")
+            fig_sector = px.bar(df_sector, x='group_name', y='return', color='return', color_continuous_scale='RdYlGn', title=f"Total Return over the Last {lookback_days} Days", labels={'group_name': 'Group'})
             st.plotly_chart(fig_sector, use_container_width=True)
     except Exception as e:
         st.write("Sector data unavailable.")
 
+    with st.expander("Create Custom Group"):
+        group_name = st.text_input("Group Name")
+        group_tickers = st.multiselect("Group Members", get_tickers(), key="group_tickers")
+        if st.button("Save Group"):
+            if not group_name or not group_tickers:
+                st.warning("Enter a group name and select at least one ticker.")
+            else:
+                try:
+                    with st.spinner("Building group index..."):
+                        save_custom_group(group_name, group_tickers)
+                    st.cache_data.clear()
+                    st.success(f"Group '{group_name}' saved.")
+                except ValueError as e:
+                    st.error(str(e))
+
 # --- TAB 2: PORTFOLIO BUILDER ---
 with tab2:
     st.header("Portfolio Simulator")
@@ -6,6 +6,9 @@ from sqlalchemy import text
 import datetime
 import time
 
+from analytics import adjust_prices, cumulative_factor_after, update_group_indices
+from init_db import migrate_db
+
 # Configuration
 DATABASE_URL = "sqlite:///market.db"
 # Added SPY for Beta calculation, and Crypto
@@ -23,7 +26,11 @@ def get_db_engine():
 
 
 def fetch_stock_data(ticker, retries=3):
-    """Fetch stock data from yfinance with retry logic."""
+    """
+    Fetch stock data from yfinance with retry logic.
+    Returns as-traded closes/volumes plus dividends and splits, so stored
+    history does not change when a later dividend or split is announced.
+    """
     for i in range(retries):
         try:
             print(f"Fetching data for {ticker}...")
@@ -31,6 +38,8 @@ def fetch_stock_data(ticker, retries=3):
                 ticker,
                 start=START_DATE,
                 end=END_DATE,
+                auto_adjust=False,
+                actions=True,
                 progress=False)
             if df.empty:
                 print(f"Warning: No data found for {ticker}")
@@ -44,15 +53,24 @@ def fetch_stock_data(ticker, retries=3):
                 df.columns = df.columns.droplevel(
                     1)  # Drop Ticker level if present
 
+            for col in ('Dividends', 'Stock Splits'):
+                if col not in df.columns:
+                    df[col] = 0.0
+
+            # yfinance 'Close', 'Volume' and 'Dividends' are split adjusted;
+            # undo the splits that happened after each day
+            df = df.sort_values('Date')
+            df['split_ratio'] = df['Stock Splits'].replace(0, 1).fillna(1.0)
+            splits_after = cumulative_factor_after(df['split_ratio'])
+            df['raw_close_price'] = df['Close'] * splits_after
+            df['raw_volume'] = (df['Volume'] / splits_after).round()
+            df['dividend'] = df['Dividends'].fillna(0.0) * splits_after
+
             # Rename columns to match schema
-            df = df.rename(columns={
-                'Date': 'date',
-                'Close': 'close_price',
-                'Volume': 'volume'
-            })
+            df = df.rename(columns={'Date': 'date'})
 
             # Keep only necessary columns
-            df = df[['date', 'close_price', 'volume']]
+            df = df[['date', 'raw_close_price', 'raw_volume', 'dividend', 'split_ratio']]
             df['ticker'] = ticker
 
             # Normalize date
@@ -105,14 +123,34 @@ def fetch_economic_data():
         return None
 
 
+def fetch_shares_outstanding(ticker):
+    """Fetch current shares outstanding from yfinance (None if unavailable)."""
+    try:
+        shares = yf.Ticker(ticker).fast_info['shares']
+        return int(shares) if shares else None
+    except Exception as e:
+        print(f"Could not fetch shares outstanding for {ticker}: {e}")
+        return None
+
+
 def load_data(engine):
     """Main ETL process."""
 
+    # 0. Upgrade databases created with an older schema
+    migrate_db(engine)
+
     # 1. Load Dimension Table (Stocks)
     with engine.connect() as conn:
+        # Keep the last known shares outstanding in case a lookup fails, so the
+        # cap-weighted indices do not drop a member for a day
+        known_shares = pd.read_sql(
+            text("SELECT ticker, shares_outstanding FROM dim_stock"), conn
+        ).set_index('ticker')['shares_outstanding'].dropna().to_dict()
+
         # Clear existing data to avoid duplicates (simple approach for this
         # task)
         conn.execute(text("DELETE FROM fact_price_daily"))
+        conn.execute(text("DELETE FROM fact_corporate_action"))
         conn.execute(text("DELETE FROM dim_stock"))
         conn.execute(text("DELETE FROM fact_economic"))
         conn.commit()
@@ -129,6 +167,8 @@ def load_data(engine):
 
         print("Loading dim_stock...")
         df_stocks = pd.DataFrame(stocks)
+        df_stocks['shares_outstanding'] = df_stocks['ticker'].apply(
+            lambda t: fetch_shares_outstanding(t) or known_shares.get(t))
         df_stocks.to_sql('dim_stock', engine, if_exists='append', index=False)
 
     # 2. Load Fact Table (Prices)
@@ -141,8 +181,20 @@ def load_data(engine):
             all_prices.append(df)
 
     if all_prices:
+        df_all = pd.concat(all_prices)
+        is_action = (df_all['dividend'] > 0) | (df_all['split_ratio'] != 1)
+        df_actions = df_all.loc[is_action, ['date', 'ticker', 'dividend', 'split_ratio']]
+
+        print("Loading fact_corporate_action...")
+        df_actions.to_sql(
+            'fact_corporate_action',
+            engine,
+            if_exists='append',
+            index=False)
+
         print("Loading fact_price_daily...")
-        df_final_prices = pd.concat(all_prices)
+        df_final_prices = adjust_prices(
+            df_all[['date', 'ticker', 'raw_close_price', 'raw_volume']], df_actions)
         df_final_prices.to_sql(
             'fact_price_daily',
             engine,
@@ -157,6 +209,10 @@ def load_data(engine):
         df_eco = df_eco.ffill()
         df_eco.to_sql('fact_economic', engine, if_exists='append', index=False)
 
+    # 4. Extend Sector/Group Index Series (only dates after the last stored level)
+    print("Updating fact_group_index...")
+    update_group_indices(engine)
+
     print("ETL Pipeline completed successfully.")
 
 
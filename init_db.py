@@ -23,5 +23,30 @@ def init_db():
     except Exception as e:
         print(f"Error executing schema: {e}")
 
+# Columns added to existing tables after their first release
+ADDED_COLUMNS = {
+    'dim_stock': {'shares_outstanding': 'BIGINT'},
+    'fact_price_daily': {'raw_close_price': 'DECIMAL(15, 4)', 'raw_volume': 'BIGINT'},
+}
+
+def migrate_db(engine):
+    """Bring an existing database up to schema.sql without dropping any data."""
+    with engine.connect() as conn:
+        with open("schema.sql", "r") as f:
+            sql_script = f.read()
+
+        # Create tables added since the database was initialized
+        for statement in sql_script.split(';'):
+            if "CREATE TABLE" in statement:
+                conn.execute(text(statement.replace("CREATE TABLE", "CREATE TABLE IF NOT EXISTS")))
+
+        for table, columns in ADDED_COLUMNS.items():
+            existing = {row[1] for row in conn.execute(text(f"PRAGMA table_info({table})"))}
+            for column, col_type in columns.items():
+                if column not in existing:
+                    print(f"Adding column {table}.{column}...")
+                    conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {col_type}"))
+        conn.commit()
+
 if __name__ == "__main__":
     init_db()
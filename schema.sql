@@ -1,4 +1,7 @@
 -- Drop tables if they exist
+DROP TABLE IF EXISTS fact_group_index;
+DROP TABLE IF EXISTS dim_group_member;
+DROP TABLE IF EXISTS fact_corporate_action;
 DROP TABLE IF EXISTS fact_economic;
 DROP TABLE IF EXISTS fact_price_daily;
 DROP TABLE IF EXISTS dim_stock;
@@ -7,15 +10,28 @@ DROP TABLE IF EXISTS dim_stock;
 CREATE TABLE dim_stock (
     ticker VARCHAR(10) PRIMARY KEY,
     company_name VARCHAR(255),
-    sector VARCHAR(100)
+    sector VARCHAR(100),
+    shares_outstanding BIGINT
 );
 
 -- Create Fact Table: Daily Price
 CREATE TABLE fact_price_daily (
     date DATE NOT NULL,
     ticker VARCHAR(10) NOT NULL,
-    close_price DECIMAL(15, 4),
-    volume BIGINT,
+    close_price DECIMAL(15, 4), -- dividend/split adjusted
+    volume BIGINT, -- split adjusted
+    raw_close_price DECIMAL(15, 4), -- as traded
+    raw_volume BIGINT, -- as traded
+    PRIMARY KEY (date, ticker),
+    FOREIGN KEY (ticker) REFERENCES dim_stock(ticker)
+);
+
+-- Create Fact Table: Dividends and Stock Splits (as traded, per share)
+CREATE TABLE fact_corporate_action (
+    date DATE NOT NULL,
+    ticker VARCHAR(10) NOT NULL,
+    dividend DECIMAL(15, 6),
+    split_ratio DECIMAL(10, 4),
     PRIMARY KEY (date, ticker),
     FOREIGN KEY (ticker) REFERENCES dim_stock(ticker)
 );
@@ -26,3 +42,21 @@ CREATE TABLE fact_economic (
     interest_rate_10y DECIMAL(10, 4),
     inflation_cpi DECIMAL(10, 4)
 );
+
+-- Create Dimension Table: User-defined Groups
+CREATE TABLE dim_group_member (
+    group_name VARCHAR(100) NOT NULL,
+    ticker VARCHAR(10) NOT NULL,
+    PRIMARY KEY (group_name, ticker),
+    FOREIGN KEY (ticker) REFERENCES dim_stock(ticker)
+);
+
+-- Create Fact Table: Sector/Group Index Levels (base 100)
+CREATE TABLE fact_group_index (
+    group_name VARCHAR(100) NOT NULL,
+    weighting VARCHAR(10) NOT NULL, -- 'equal' or 'cap'
+    date DATE NOT NULL,
+    daily_return DECIMAL(15, 8),
+    index_value DECIMAL(15, 4),
+    PRIMARY KEY (group_name, weighting, date)
+);
@@ -0,0 +1,190 @@
+import argparse
+import datetime
+import gzip
+import io
+import os
+
+import pandas as pd
+import sqlalchemy
+
+from analytics import adjust_prices, update_group_indices
+from init_db import init_db
+
+# Configuration
+DATABASE_URL = "sqlite:///market.db"
+SNAPSHOT_DIR = "snapshots"
+# Decimal places of the DECIMAL columns in schema.sql; values are rounded to
+# this before export so float noise from re-downloads is not a "change".
+DECIMAL_PLACES = 4
+
+# Tables mirrored into snapshots: primary key columns and the date column
+# used to split rows into monthly partitions (None = single partition).
+# Full-state tables are written whole whenever they change and restored from
+# the newest file only, so deleted rows stay deleted. Derived columns are not
+# exported; adjusted prices are recomputed from as-traded prices and the
+# corporate actions, so history rows never change once written.
+TABLES = {
+    'dim_stock': {'key': ['ticker'], 'partition': None},
+    'dim_group_member': {'key': ['group_name', 'ticker'], 'partition': None,
+                         'full_state': True},
+    'fact_corporate_action': {'key': ['date', 'ticker'], 'partition': 'date'},
+    'fact_price_daily': {'key': ['date', 'ticker'], 'partition': 'date',
+                         'derived': ['close_price', 'volume']},
+    'fact_group_index': {'key': ['group_name', 'weighting', 'date'],
+                         'partition': 'date'},
+    'fact_economic': {'key': ['date'], 'partition': 'date'},
+}
+
+
+def get_db_engine():
+    return sqlalchemy.create_engine(DATABASE_URL)
+
+
+def _partition_dirs(table):
+    """Return every partition directory of a table, oldest first."""
+    table_dir = os.path.join(SNAPSHOT_DIR, table)
+    if not os.path.isdir(table_dir):
+        return []
+    if TABLES[table]['partition'] is None:
+        return [table_dir]
+    return [
+        os.path.join(table_dir, name)
+        for name in sorted(os.listdir(table_dir))
+        if os.path.isdir(os.path.join(table_dir, name))
+    ]
+
+
+def _read_partitions(table, **read_kwargs):
+    """
+    Read all delta files of a table and collapse them into the latest state.
+    Files are replayed in name (= export time) order, later rows win.
+    Full-state tables are read from their newest file only.
+    """
+    paths = [
+        os.path.join(part_dir, name)
+        for part_dir in _partition_dirs(table)
+        for name in sorted(os.listdir(part_dir))
+        if name.endswith('.csv.gz')
+    ]
+    if not paths:
+        return None
+    if TABLES[table].get('full_state'):
+        paths = paths[-1:]
+
+    frames = [pd.read_csv(path, **read_kwargs) for path in paths]
+
+    key = TABLES[table]['key']
+    df = pd.concat(frames, ignore_index=True)
+    return df.drop_duplicates(subset=key, keep='last').sort_values(key)
+
+
+def _as_strings(df):
+    """
+    Round numeric columns to the schema precision and round-trip the frame
+    through CSV so it compares equal to stored deltas. Numbers are written as
+    floats because SQLite returns integral DECIMAL values as integers.
+    """
+    numeric = df.select_dtypes('number').columns
+    df = df.astype({col: float for col in numeric})
+    buf = io.StringIO(df.round(DECIMAL_PLACES).to_csv(index=False))
+    return pd.read_csv(buf, dtype=str, keep_default_na=False)
+
+
+def _write_delta(path, df):
+    """Write a gzipped CSV with a fixed header timestamp (byte-stable output)."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as raw:
+        with gzip.GzipFile(fileobj=raw, mode='wb', mtime=0) as gz:
+            gz.write(df.to_csv(index=False).encode('utf-8'))
+
+
+def export_snapshots(engine):
+    """
+    Append the rows that are new or changed since the last export as
+    compressed delta files, one per touched monthly partition.
+    Rows dropped from the database are kept in the snapshots.
+    """
+    now = datetime.datetime.now(datetime.timezone.utc)
+    run_id = now.strftime('%Y%m%dT%H%M%S')
+
+    for table, spec in TABLES.items():
+        key = spec['key']
+        current = pd.read_sql(f"SELECT * FROM {table}", engine)
+        current = current.drop(columns=spec.get('derived', []))
+        current = _as_strings(current.sort_values(key))
+
+        stored = _read_partitions(table, dtype=str, keep_default_na=False)
+        if stored is None:
+            delta = current
+            changed = not delta.empty
+        else:
+            # Columns added to the schema since earlier exports compare as empty
+            stored = stored.reindex(columns=current.columns, fill_value='')
+            if spec.get('full_state'):
+                # Any difference, deletions included, rewrites the whole table
+                delta = current
+                changed = not current.reset_index(drop=True).equals(
+                    stored.reset_index(drop=True))
+            else:
+                merged = current.merge(
+                    stored, how='left', on=list(current.columns), indicator=True)
+                delta = merged[merged['_merge'] == 'left_only'][current.columns]
+                changed = not delta.empty
+
+        if not changed:
+            print(f"{table}: no changes.")
+            continue
+
+        print(f"{table}: exporting {len(delta)} new/changed rows...")
+        if spec['partition'] is None:
+            path = os.path.join(SNAPSHOT_DIR, table, f"{run_id}.csv.gz")
+            _write_delta(path, delta)
+            continue
+
+        months = delta[spec['partition']].str[:7]
+        for month, df_month in delta.groupby(months):
+            path = os.path.join(SNAPSHOT_DIR, table, month, f"{run_id}.csv.gz")
+            _write_delta(path, df_month)
+
+    print("Snapshot export completed successfully.")
+
+
+def restore_db(engine):
+    """Recreate the schema, load the latest snapshots and extend group indices."""
+    init_db()
+
+    # Load dimensions before facts to satisfy foreign keys
+    df_actions = pd.DataFrame(columns=['date', 'ticker', 'dividend', 'split_ratio'])
+    for table, spec in TABLES.items():
+        df = _read_partitions(table, dtype={col: str for col in spec['key']},
+                              float_precision='round_trip')
+        if df is None:
+            print(f"{table}: no snapshots found.")
+            continue
+        if table == 'fact_corporate_action':
+            df_actions = df
+        if spec.get('derived'):
+            df = adjust_prices(df, df_actions)
+        print(f"Restoring {table} ({len(df)} rows)...")
+        df.to_sql(table, engine, if_exists='append', index=False,
+                  chunksize=10000)
+
+    # Index levels are restored as stored; only extend series that are
+    # missing or behind the restored prices
+    print("Updating fact_group_index...")
+    update_group_indices(engine)
+
+    print("Database restored from snapshots.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Export or restore market.db as compressed delta snapshots.")
+    parser.add_argument('command', choices=['export', 'restore'])
+    args = parser.parse_args()
+
+    engine = get_db_engine()
+    if args.command == 'export':
+        export_snapshots(engine)
+    else:
+        restore_db(engine)